@@ -1,10 +1,19 @@
 import os
-import json
+import hmac
+import orjson
 import csv
+import atexit
+import threading
 import re
 import string
+from collections import Counter, defaultdict
+from functools import lru_cache
+from itertools import chain
+from types import SimpleNamespace
+from typing import NamedTuple
 from flask import Flask, render_template, request, redirect, url_for, session
 from flask_sqlalchemy import SQLAlchemy
+from werkzeug.security import check_password_hash, generate_password_hash
 
 # Initialize Flask app
 # Ensure Flask loads templates from the project's 'templates' folder
@@ -12,6 +21,16 @@ templates_path = os.path.join(os.path.dirname(__file__), 'templates')
 app = Flask(__name__, template_folder=templates_path)
 app.secret_key = 'bank_secret_key'
 
+# Debugger, reloader and template auto-reload are opt-in via FLASK_DEBUG=1
+DEBUG = os.environ.get('FLASK_DEBUG') == '1'
+if not DEBUG:
+    # templates are parsed once here; renders hit the compiled cache without stat()-ing the files
+    app.config['TEMPLATES_AUTO_RELOAD'] = False
+    app.jinja_env.auto_reload = False
+    for _template in ('home.html', 'register.html', 'login.html', 'dashboard.html', 'user_details.html',
+                      'check_balance.html', 'other_services.html', 'bankbot.html'):
+        app.jinja_env.get_template(_template)
+
 # Configure Database
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///bank.db'
 db = SQLAlchemy(app)
@@ -22,125 +41,264 @@ TRAINING_DATA_FILE = os.path.join(os.path.dirname(__file__), 'training_data.json
 # Load training data
 def load_training_data():
     if os.path.exists(TRAINING_DATA_FILE):
-        with open(TRAINING_DATA_FILE, 'r') as f:
-            return json.load(f)
+        with open(TRAINING_DATA_FILE, 'rb') as f:
+            return orjson.loads(f.read())
     return {}
 
 training_data = load_training_data()
 
+# Precompiled patterns used on the chat hot path
+_RE_DIGITS = re.compile(r'\d+')
+_RE_ACCT = re.compile(r'\b(\d{6,})\b')
+_RE_AMOUNT = re.compile(r'\b(\d+)\b')
+_RE_MONEY_ENT = re.compile(r'MONEY:(\d+)')
+_RE_WORD = re.compile(r'\b([A-Za-z]{2,})\b')
+
+# very common contractions used in dataset, expanded by normalize_text in a single pass
+_CONTRACTIONS = {"what's": "what is", "it's": "it is", "i'm": "i am"}
+_RE_CONTRACTIONS = re.compile('|'.join(map(re.escape, _CONTRACTIONS)))
+
+# normalize_text keeps only lowercase letters, digits and spaces: strip non-ASCII with a regex, then drop
+# the remaining ASCII punctuation/control characters with one translate table
+_RE_NONASCII = re.compile(r'[^\x00-\x7f]+')
+_KEEP_CHARS = set(string.ascii_lowercase + string.digits + ' ')
+_STRIP_TABLE = str.maketrans('', '', ''.join(chr(c) for c in range(128) if chr(c) not in _KEEP_CHARS))
+
+# Normalization helper (pure, so repeated messages are served from the cache)
+@lru_cache(maxsize=4096)
+def normalize_text(s):
+    if not s:
+        return ''
+    s = s.lower().strip()
+    # expand very common contractions used in dataset
+    s = _RE_CONTRACTIONS.sub(lambda m: _CONTRACTIONS[m.group(0)], s)
+    # remove punctuation except keep digits and letters and whitespace
+    s = _RE_NONASCII.sub('', s).translate(_STRIP_TABLE)
+    # collapse multiple spaces
+    s = ' '.join(s.split())
+    return s
+
+class Row(NamedTuple):
+    """A dataset row plus its normalized text and token set, computed once when the row is created."""
+    text: str
+    intent: str
+    response: str
+    entities: str
+    norm: str
+    tokens: frozenset
+
+def make_row(text, intent, response, entities=''):
+    """Build a Row, normalizing its text once so lookups never re-normalize it."""
+    norm = normalize_text(text)
+    return Row(text, intent, response, entities, norm, frozenset(norm.split()))
+
 # Load CSV dataset
 DATASET_PATH = os.path.join(os.path.dirname(__file__), 'bankbot', 'milestone 2', 'bank_chatbot_dataset.csv')
 USER_DATA_FILE = os.path.join(os.path.dirname(__file__), 'user_data.json')
+# Chat turns are appended here as JSON lines and folded into USER_DATA_FILE every USER_DATA_SNAPSHOT_EVERY events
+USER_DATA_LOG = USER_DATA_FILE + '.log'
+USER_DATA_SNAPSHOT_EVERY = 100
 
 def load_dataset():
     dataset = []
     if os.path.exists(DATASET_PATH):
-        with open(DATASET_PATH, 'r', encoding='utf-8-sig') as f:
-            reader = csv.DictReader(f)
+        with open(DATASET_PATH, 'r', encoding='utf-8-sig', newline='') as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if not header:
+                return dataset
+            idx = {h.strip(): i for i, h in enumerate(header)}
+            text_i, intent_i, response_i = idx['text'], idx['intent'], idx['response']
+            # without an 'entities' header, extra cells are unquoted commas from the response, not entities
+            entities_i = idx.get('entities', -1)
             for row in reader:
-                for k in row:
-                    # FIX: safely strip values ONLY if string
-                    if isinstance(row[k], str):
-                        row[k] = row[k].strip()
-                    else:
-                        # Convert list/dict/None → string
-                        row[k] = str(row[k]).strip()
-                dataset.append(row)
+                if not row:
+                    continue
+                n = len(row)
+                dataset.append(make_row(
+                    row[text_i].strip() if n > text_i else '',
+                    row[intent_i].strip() if n > intent_i else '',
+                    row[response_i].strip() if n > response_i else '',
+                    row[entities_i].strip() if 0 <= entities_i < n else ''
+                ))
     return dataset
 
 def load_user_data():
     if os.path.exists(USER_DATA_FILE):
-        with open(USER_DATA_FILE, 'r') as f:
-            return json.load(f)
+        with open(USER_DATA_FILE, 'rb') as f:
+            return orjson.loads(f.read())
     return {}
 
 def save_user_data(data):
-    with open(USER_DATA_FILE, 'w') as f:
-        json.dump(data, f, indent=2)
+    with open(USER_DATA_FILE, 'wb') as f:
+        f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+
+def replay_user_data_log(data):
+    """Apply events left in USER_DATA_LOG (e.g. after a crash) on top of the snapshot. Returns the event count."""
+    if not os.path.exists(USER_DATA_LOG):
+        return 0
+    count = 0
+    with open(USER_DATA_LOG, 'rb') as f:
+        for line in f:
+            try:
+                event = orjson.loads(line)
+            except orjson.JSONDecodeError:
+                # a torn final line from an interrupted write
+                continue
+            record = data.setdefault(event['user_id'], {'conversations': []})
+            record.update(event['state'])
+            record.setdefault('conversations', []).append(event['turn'])
+            count += 1
+    return count
 
 dataset = load_dataset()
 user_data = load_user_data()
-
-# Normalization helper
-def normalize_text(s):
-    if not s:
-        return ''
-    s = s.lower().strip()
-    # expand very common contractions used in dataset
-    s = s.replace("what's", "what is").replace("it's", "it is").replace("i'm", "i am")
-    # remove punctuation except keep digits and letters and whitespace
-    allowed = set(string.ascii_lowercase + string.digits + ' ')
-    s = ''.join(ch for ch in s if ch in allowed)
-    # collapse multiple spaces
-    s = ' '.join(s.split())
-    return s
+# replayed events stay in the log until this process writes its next snapshot, so importing the module
+# (flask shell, scripts) never rewrites user_data.json or drops another process's log lines
+replay_user_data_log(user_data)
+# append mode: every write lands at the current end of the file, even after another process truncates it;
+# unbuffered: each event goes out as a single write() of one complete line
+_USER_LOG_FH = open(USER_DATA_LOG, 'ab', buffering=0)
+_user_log_events = 0
+# serializes conversation updates to user_data, event-log writes and snapshots
+# (re-entrant: log_conversation_turn may snapshot)
+_USER_LOG_LOCK = threading.RLock()
+# chat handlers hold the lock of the user they update
+_USER_LOCKS = defaultdict(threading.Lock)
+
+def snapshot_user_data():
+    """Write the full user_data snapshot and empty the event log."""
+    global _user_log_events
+    with _USER_LOG_LOCK:
+        save_user_data(user_data)
+        # only once the snapshot is written do the logged events become redundant
+        _USER_LOG_FH.truncate(0)
+        _user_log_events = 0
+
+def log_conversation_turn(user_id_str, turn, updates=None):
+    """Apply a conversation turn (and any state updates) to user_data and append it to the event log.
+
+    Both happen under _USER_LOG_LOCK, so a snapshot taken by another request either includes the turn and
+    its log line or neither; replaying the log after a crash never adds a turn twice.
+    """
+    global _user_log_events
+    with _USER_LOG_LOCK:
+        record = user_data[user_id_str]
+        if updates:
+            record.update(updates)
+        record['conversations'].append(turn)
+        state = {k: v for k, v in record.items() if k != 'conversations'}
+        _USER_LOG_FH.write(orjson.dumps({'user_id': user_id_str, 'state': state, 'turn': turn}) + b'\n')
+        _user_log_events += 1
+        if _user_log_events >= USER_DATA_SNAPSHOT_EVERY:
+            snapshot_user_data()
+
+@atexit.register
+def _flush_user_data_log():
+    # only processes that actually logged turns rewrite the snapshot (e.g. not the dev-server reloader parent)
+    if _user_log_events:
+        snapshot_user_data()
+
+# Lookup indexes over the dataset, built once at startup and kept in sync by append_to_dataset_row.
+# _DATASET_LOCK guards them (and dataset appends): writers and readers on other chat threads must hold it.
+_DATASET_LOCK = threading.Lock()
+NORM_TO_ROW = {}
+# (text, intent, entities) of every row, for O(1) duplicate checks on append
+DATASET_SET = set()
+TOKEN_TO_ROWS = defaultdict(set)
+# explicit ACCOUNT_NUMBER/MONEY values from dataset entities -> index of the first row carrying them
+EXPLICIT_NUMS = {}
+# distinct lengths of the EXPLICIT_NUMS keys, so a message is checked with one dict lookup per substring length
+EXPLICIT_NUM_LENGTHS = set()
+
+def index_dataset_row(idx, row):
+    """Add dataset[idx] to the lookup indexes."""
+    if row.norm:
+        # keep the first row for a given text so exact matches behave like a top-down scan
+        NORM_TO_ROW.setdefault(row.norm, row)
+    for token in row.tokens:
+        TOKEN_TO_ROWS[token].add(idx)
+    DATASET_SET.add((row.text, row.intent, row.entities))
+
+    entities = row.entities.strip()
+    if 'ACCOUNT_NUMBER' in entities or 'MONEY' in entities:
+        for p in entities.split('|'):
+            if ':' not in p:
+                continue
+            val = p.split(':', 1)[1].strip()
+            if val and _RE_DIGITS.search(val) and val not in EXPLICIT_NUMS:
+                EXPLICIT_NUMS[val] = idx
+                EXPLICIT_NUM_LENGTHS.add(len(val))
+
+def explicit_num_hits(src):
+    """Yield the row index of every explicit dataset number occurring as a substring of src."""
+    # cost depends on len(src) and the number of distinct value lengths, not on how many values are known
+    for length in EXPLICIT_NUM_LENGTHS:
+        for start in range(len(src) - length + 1):
+            idx = EXPLICIT_NUMS.get(src[start:start + length])
+            if idx is not None:
+                yield idx
+
+for _idx, _row in enumerate(dataset):
+    index_dataset_row(_idx, _row)
 
 def find_intent_response(user_message):
     """Find matching intent and response from dataset with robust matching."""
     if not user_message:
         return None
 
-    message_lower = user_message.strip().lower()
     message_norm = normalize_text(user_message)
 
+    # append_to_dataset_row updates the indexes from other chat threads, so read them under the same lock
+    with _DATASET_LOCK:
+        row = match_dataset_row(user_message, message_norm)
+    if row is None:
+        return None
+    return {
+        'intent': row.intent,
+        'response': row.response,
+        'entities': row.entities
+    }
+
+def match_dataset_row(user_message, message_norm):
+    """Return the best dataset row for a message, or None. The caller must hold _DATASET_LOCK."""
     # 1) Exact normalized match
-    for row in dataset:
-        row_text = (row.get('text') or '').strip().lower()
-        row_norm = normalize_text(row_text)
-        if row_norm and row_norm == message_norm:
-            return {
-                'intent': row.get('intent', ''),
-                'response': row.get('response', ''),
-                'entities': row.get('entities', '')
-            }
+    row = NORM_TO_ROW.get(message_norm)
+    if row is not None:
+        return row
 
     # 2) If dataset row contains explicit ACCOUNT_NUMBER:NNN or MONEY:NNN, match by presence of that number in the message
-    message_digits = re.findall(r'\d+', user_message)
-    digits_concat = ''.join(message_digits)  # helps with continuous numbers
-    for row in dataset:
-        entities = (row.get('entities') or '').strip()
-        if 'ACCOUNT_NUMBER' in entities or 'MONEY' in entities:
-            # extract number after colon if present in dataset entities
-            parts = [p for p in entities.split('|') if ':' in p]
-            for p in parts:
-                key, val = p.split(':', 1)
-                val = val.strip()
-                if val and re.search(r'\d+', val):
-                    # compare numeric substrings
-                    if val in user_message or val in digits_concat or any(val == d for d in message_digits):
-                        return {
-                            'intent': row.get('intent', ''),
-                            'response': row.get('response', ''),
-                            'entities': row.get('entities', '')
-                        }
+    # (every explicit value contains a digit, so digit-free messages and digit-free datasets skip this step)
+    message_digits = _RE_DIGITS.findall(user_message) if EXPLICIT_NUMS else None
+    if message_digits:
+        # the concatenated digits (helps with continuous numbers) only add matches when the message has
+        # several digit runs; with one run it is a substring of the message itself
+        sources = (user_message, ''.join(message_digits)) if len(message_digits) > 1 else (user_message,)
+        hits = [idx for src in sources for idx in explicit_num_hits(src)]
+        if hits:
+            return dataset[min(hits)]
 
     # 3) Partial matching using normalized substrings / token overlap
-    msg_tokens = set(message_norm.split())
-    best_row = None
-    best_score = 0
-    for row in dataset:
-        row_text = (row.get('text') or '').strip().lower()
-        row_norm = normalize_text(row_text)
-        if not row_norm:
-            continue
-        row_tokens = set(row_norm.split())
-        # token overlap score
-        overlap = len(msg_tokens & row_tokens)
-        # prefer rows where a majority of row tokens appear in message
-        score = overlap
-        if score > best_score:
-            best_score = score
-            best_row = row
-    # threshold: at least one overlapping token and best_score not zero
-    if best_row and best_score >= 1:
-        return {
-            'intent': best_row.get('intent', ''),
-            'response': best_row.get('response', ''),
-            'entities': best_row.get('entities', '')
-        }
+    # token overlap score per row: the sparse product of the row/token incidence index with the message's
+    # token set, computed as one C-level count over the concatenated posting lists
+    scores = Counter(chain.from_iterable(TOKEN_TO_ROWS.get(token, ()) for token in set(message_norm.split())))
+    # threshold: at least one overlapping token (every counted row has a score of at least 1)
+    if scores:
+        best_score = max(scores.values())
+        # ties keep the earliest dataset row
+        return dataset[min(idx for idx, score in scores.items() if score == best_score)]
 
     return None
 
+# dataset entity keys carrying explicit values, and the entity names they fill
+_EXPLICIT_ENTITY_NAMES = {'ACCOUNT_NUMBER': 'account_number', 'MONEY': 'amount', 'PERSON': 'person'}
+# regex fallbacks per entity, in extraction order
+_ENTITY_FALLBACKS = {
+    'account_number': _RE_ACCT,  # sequences of 6+ digits as possible account numbers
+    'amount': _RE_AMOUNT,
+    'person': _RE_WORD
+}
+
 def extract_entities(text, entities_str):
     """Extract entities from text using entity string. Also respect explicit values in dataset entities."""
     entities = {}
@@ -151,48 +309,39 @@ def extract_entities(text, entities_str):
     for ent in entities_str.split('|'):
         if ':' in ent:
             key, val = ent.split(':', 1)
-            key = key.strip().upper()
+            name = _EXPLICIT_ENTITY_NAMES.get(key.strip().upper())
             val = val.strip()
-            if key == 'ACCOUNT_NUMBER' and val:
-                # prefer explicit number from dataset if present
-                entities['account_number'] = val
-            elif key == 'MONEY' and val:
-                entities['amount'] = val
-            elif key == 'PERSON' and val:
-                entities['person'] = val
-
-    # fallback regex extraction from user text for generic entity definitions (no explicit value)
-    if 'account_number' not in entities:
-        m = re.search(r'\b(\d{6,})\b', text)  # match sequences of 6+ digits as possible account numbers
-        if m:
-            entities['account_number'] = m.group(1)
-    if 'amount' not in entities:
-        m = re.search(r'\b(\d+)\b', text)
-        if m:
-            entities['amount'] = m.group(1)
-    if 'person' not in entities:
-        m = re.search(r'\b([A-Za-z]{2,})\b', text)
-        if m:
-            entities['person'] = m.group(1)
+            if name and val:
+                # prefer explicit values from dataset if present
+                entities[name] = val
+
+    # fallback regex extraction from user text, only for entities the dataset did not supply
+    needed = _ENTITY_FALLBACKS.keys() - entities.keys()
+    if not needed:
+        return entities
+    for name, pattern in _ENTITY_FALLBACKS.items():
+        if name in needed:
+            m = pattern.search(text)
+            if m:
+                entities[name] = m.group(1)
 
     return entities
 
-def get_intent_color(intent):
-    """Return color code for different intents"""
-    intent_colors = {
-        'greet': '#4CAF50',
-        'goodbye': '#FF9800',
-        'check_balance': '#2196F3',
-        'transaction_inquiry': '#9C27B0',
-        'loan_inquiry': '#F44336',
-        'card_inquiry': '#00BCD4',
-        'block_card': '#E91E63',
-        'branch_locator': '#795548',
-        'transfer_money': '#FF5722',
-        'thanks': '#8BC34A',
-        'out_of_scope': '#757575'
-    }
-    return intent_colors.get(intent, '#757575')
+# Color code for different intents (looked up directly at call sites)
+INTENT_COLORS = {
+    'greet': '#4CAF50',
+    'goodbye': '#FF9800',
+    'check_balance': '#2196F3',
+    'transaction_inquiry': '#9C27B0',
+    'loan_inquiry': '#F44336',
+    'card_inquiry': '#00BCD4',
+    'block_card': '#E91E63',
+    'branch_locator': '#795548',
+    'transfer_money': '#FF5722',
+    'thanks': '#8BC34A',
+    'out_of_scope': '#757575'
+}
+DEFAULT_INTENT_COLOR = '#757575'
 
 # -----------------------------
 # Database Model
@@ -200,9 +349,9 @@ def get_intent_color(intent):
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(100), nullable=False)
-    email = db.Column(db.String(100), nullable=False, unique=True)
-    password = db.Column(db.String(100), nullable=False)
-    account_number = db.Column(db.String(20), nullable=False, unique=True)
+    email = db.Column(db.String(100), nullable=False, unique=True, index=True)
+    password = db.Column(db.String(255), nullable=False)  # werkzeug password hash
+    account_number = db.Column(db.String(20), nullable=False, unique=True, index=True)
     account_type = db.Column(db.String(50), nullable=False)
     balance = db.Column(db.Float, default=0.0)
 
@@ -210,6 +359,17 @@ class User(db.Model):
 with app.app_context():
     db.create_all()
 
+@lru_cache(maxsize=1024)
+def get_user_cached(user_id):
+    """Return a read-only snapshot of a user's columns, hitting the database only on a cache miss.
+
+    Call get_user_cached.cache_clear() after writing to the users table.
+    """
+    user = User.query.get(user_id)
+    if user is None:
+        return None
+    return SimpleNamespace(**{c.name: getattr(user, c.name) for c in User.__table__.columns})
+
 # -----------------------------
 # Routes
 # -----------------------------
@@ -241,19 +401,33 @@ def register():
             new_user = User(
                 username=username,
                 email=email,
-                password=password,
+                password=generate_password_hash(password),
                 account_number=account_number,
                 account_type=account_type,
                 balance=5000.0  # Default balance
             )
             db.session.add(new_user)
             db.session.commit()
+            get_user_cached.cache_clear()
             return redirect(url_for('login'))
         except Exception as e:
             db.session.rollback()
             return f"An error occurred during registration: {str(e)}"
     return render_template('register.html')
 
+def check_user_password(user, password):
+    """Verify a login password, upgrading accounts still stored in plaintext to a hash on success."""
+    stored = user.password
+    if stored.startswith(('scrypt:', 'pbkdf2:')) and stored.count('$') == 2:
+        return check_password_hash(stored, password)
+    # accounts registered before passwords were hashed: constant-time compare, then store the hash
+    if not hmac.compare_digest(stored.encode('utf-8'), password.encode('utf-8')):
+        return False
+    user.password = generate_password_hash(password)
+    db.session.commit()
+    get_user_cached.cache_clear()
+    return True
+
 # ---------- Login ----------
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -261,8 +435,9 @@ def login():
         email = request.form['email']
         password = request.form['password']
 
-        user = User.query.filter_by(email=email, password=password).first()
-        if user:
+        # single indexed lookup on email, then one password hash check
+        user = User.query.filter_by(email=email).first()
+        if user and check_user_password(user, password):
             session['user_id'] = user.id
             session['username'] = user.username
             return redirect(url_for('dashboard'))
@@ -275,7 +450,7 @@ def login():
 def dashboard():
     if 'user_id' not in session:
         return redirect(url_for('login'))
-    user = User.query.get(session['user_id'])
+    user = get_user_cached(session['user_id'])
     return render_template('dashboard.html', username=session['username'], account_number=user.account_number, balance=user.balance)
 
 # ---------- User Details ----------
@@ -283,7 +458,7 @@ def dashboard():
 def user_details():
     if 'user_id' not in session:
         return redirect(url_for('login'))
-    user = User.query.get(session['user_id'])
+    user = get_user_cached(session['user_id'])
     return render_template('user_details.html', user=user)
 
 # ---------- Check Balance ----------
@@ -316,26 +491,35 @@ def bankbot():
         return redirect(url_for('login'))
     return render_template('bankbot.html', username=session['username'])
 
+# Dataset appender kept open for the life of the process; rows are buffered and flushed on shutdown
+os.makedirs(os.path.dirname(DATASET_PATH), exist_ok=True)
+_dataset_needs_header = not (os.path.exists(DATASET_PATH) and os.path.getsize(DATASET_PATH) > 0)
+_DATASET_FH = open(DATASET_PATH, 'a', encoding='utf-8-sig', newline='', buffering=1 << 16)
+_DATASET_WRITER = csv.writer(_DATASET_FH)
+if _dataset_needs_header:
+    _DATASET_WRITER.writerow(['text','intent','response','entities'])
+    _DATASET_FH.flush()
+
+@atexit.register
+def _close_dataset_appender():
+    _DATASET_FH.flush()
+    os.fsync(_DATASET_FH.fileno())
+    _DATASET_FH.close()
+
 def append_to_dataset_row(text, intent, response, entities_str=''):
-    """Append a row to the CSV dataset and update in-memory dataset (avoid exact duplicates)."""
-    # ensure dataset folder & file exist with header
-    os.makedirs(os.path.dirname(DATASET_PATH), exist_ok=True)
-    file_exists = os.path.exists(DATASET_PATH) and os.path.getsize(DATASET_PATH) > 0
-
-    # check duplicates in-memory first
-    for row in dataset:
-        if row.get('text') == text and row.get('intent') == intent and row.get('entities') == entities_str:
-            return False
-
-    # open file and append
-    with open(DATASET_PATH, 'a', encoding='utf-8-sig', newline='') as f:
-        writer = csv.writer(f)
-        if not file_exists:
-            writer.writerow(['text','intent','response','entities'])
-        writer.writerow([text, intent, response, entities_str])
+    """Append a row to the CSV dataset and update in-memory dataset (avoid exact duplicates).
+
+    The caller must hold _DATASET_LOCK.
+    """
+    if (text, intent, entities_str) in DATASET_SET:
+        return False
+
+    _DATASET_WRITER.writerow([text, intent, response, entities_str])
 
     # add to in-memory dataset so it's immediately available
-    dataset.append({'text': text, 'intent': intent, 'response': response, 'entities': entities_str})
+    row = make_row(text, intent, response, entities_str)
+    dataset.append(row)
+    index_dataset_row(len(dataset) - 1, row)
     return True
 
 @app.route('/api/chat', methods=['POST'])
@@ -344,29 +528,31 @@ def chat():
         return {'error': 'Unauthorized'}, 401
 
     user_message = request.json.get('message', '').strip()
-    user = User.query.get(session['user_id'])
     user_id_str = str(session['user_id'])
-
-    # Initialize user data if not exists
-    if user_id_str not in user_data:
-        user_data[user_id_str] = {
-            'account_number': user.account_number,
-            'balance': user.balance,
-            'conversations': []
-        }
+    user_lock = _USER_LOCKS[user_id_str]
+
+    # Initialize user data if not exists (the only place the chat needs the user record)
+    with user_lock:
+        if user_id_str not in user_data:
+            user = get_user_cached(session['user_id'])
+            user_data[user_id_str] = {
+                'account_number': user.account_number,
+                'balance': user.balance,
+                'conversations': []
+            }
 
     # Find intent and response from dataset
     result = find_intent_response(user_message)
 
     # default values
     intent = 'out_of_scope'
-    intent_color = get_intent_color(intent)
+    intent_color = INTENT_COLORS.get(intent, DEFAULT_INTENT_COLOR)
     entities = {}
     bot_reply = ''
 
     if result:
         intent = result.get('intent', 'out_of_scope')
-        intent_color = get_intent_color(intent)
+        intent_color = INTENT_COLORS.get(intent, DEFAULT_INTENT_COLOR)
 
         # Extract entities (this will pick explicit values from dataset entities if present)
         entities = extract_entities(user_message, result.get('entities', ''))
@@ -384,10 +570,10 @@ def chat():
                 acct = entities.get('account_number', '')
                 if acct:
                     for row in dataset:
-                        ents = (row.get('entities') or '')
+                        ents = row.entities
                         # check dataset entities contain both ACCOUNT_NUMBER:acct and MONEY:value
                         if f"ACCOUNT_NUMBER:{acct}" in ents and 'MONEY:' in ents:
-                            m = re.search(r'MONEY:(\d+)', ents)
+                            m = _RE_MONEY_ENT.search(ents)
                             if m:
                                 bot_reply = f"💰 Your balance is {m.group(1)}."
                                 entities['amount'] = m.group(1)
@@ -395,7 +581,7 @@ def chat():
 
         # final fallback: if reply still empty but a numeric appears in the user's message
         if not bot_reply:
-            reply_digits = re.findall(r'\d+', user_message)
+            reply_digits = _RE_DIGITS.findall(user_message)
             if reply_digits:
                 bot_reply = f"💰 Your balance is {reply_digits[0]}."
 
@@ -404,23 +590,19 @@ def chat():
             bot_reply = ''
 
         # Update user_data with extracted entities
-        if entities:
-            user_data[user_id_str].update(entities)
-            if 'amount' in entities:
-                user_data[user_id_str]['last_amount'] = entities['amount']
-            if 'person' in entities:
-                user_data[user_id_str]['last_recipient'] = entities['person']
-            if 'account_number' in entities:
-                user_data[user_id_str]['account_number'] = entities['account_number']
+        updates = dict(entities)
+        if 'amount' in entities:
+            updates['last_amount'] = entities['amount']
+        if 'person' in entities:
+            updates['last_recipient'] = entities['person']
 
         # Store conversation
-        user_data[user_id_str]['conversations'].append({
-            'user': user_message,
-            'bot': bot_reply,
-            'intent': intent
-        })
-
-        save_user_data(user_data)
+        with user_lock:
+            log_conversation_turn(user_id_str, {
+                'user': user_message,
+                'bot': bot_reply,
+                'intent': intent
+            }, updates)
 
         # --- NEW: if bot reply or extracted entities contain numeric balance/account, add to dataset ---
         add_entities = []
@@ -431,14 +613,15 @@ def chat():
         entities_str = '|'.join(add_entities)
 
         # also detect numbers present in bot_reply (e.g. "5000" in "Your balance is 5000")
-        reply_digits = re.findall(r'\d+', str(bot_reply))
+        reply_digits = _RE_DIGITS.findall(str(bot_reply))
         if not entities_str and reply_digits:
             entities_str = f"MONEY:{reply_digits[0]}"
 
         # append to dataset using the original user message text (avoid duplicates)
         if entities_str:
             try:
-                append_to_dataset_row(user_message, intent, bot_reply, entities_str)
+                with _DATASET_LOCK:
+                    append_to_dataset_row(user_message, intent, bot_reply, entities_str)
             except Exception:
                 # ignore dataset append errors to avoid breaking chat flow
                 pass
@@ -446,15 +629,15 @@ def chat():
         # No dataset match
         bot_reply = "I can only assist with banking questions. Try asking about balance, transfers, loans, or cards."
         intent = "out_of_scope"
-        intent_color = get_intent_color(intent)
+        intent_color = INTENT_COLORS.get(intent, DEFAULT_INTENT_COLOR)
 
         # store fallback conversation
-        user_data[user_id_str]['conversations'].append({
-            'user': user_message,
-            'bot': bot_reply,
-            'intent': intent
-        })
-        save_user_data(user_data)
+        with user_lock:
+            log_conversation_turn(user_id_str, {
+                'user': user_message,
+                'bot': bot_reply,
+                'intent': intent
+            })
 
     return {
         'reply': bot_reply,
@@ -469,5 +652,6 @@ def logout():
     return redirect(url_for('home'))
 
 # ---------- Run Server ----------
+# Development server only; production runs wsgi:app under gunicorn (see wsgi.py)
 if __name__ == '__main__':
-    app.run(debug=True)
+    app.run(debug=DEBUG)
@@ -0,0 +1,6 @@
+# WSGI entry point for production, e.g.:
+#   gunicorn -w 1 -k gthread --threads 8 wsgi:app
+# Chat state (user_data, its event log, the learned dataset rows) lives in process memory and is loaded when
+# app.py is imported. Each worker imports it itself (no --preload), so a replacement worker starts from the
+# current files rather than a copy of the master's startup memory. Scale with threads, not workers.
+from app import app